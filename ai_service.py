@@ -4,6 +4,8 @@ AI service functionality for generating summaries and recommendations.
 """
 
 from datetime import datetime
+import numpy as np
+import pandas as pd
 from utils import get_global_weather_conditions, get_global_grid_nodes
 from config import GEMINI_API_KEY
 
@@ -21,7 +23,7 @@ def collect_system_data(analyzer, analysis_type='dashboard', n1_results=None):
         wind = weather_conditions.get('wind_speed', 2.0)
         
         # Get real grid analysis data
-        analysis = analyzer.analyze_conditions(temp, wind)
+        analysis = analyzer.analyze_conditions(temp, wind, as_frame=True)
         
         # For N-1 analysis, use provided results or run new analysis
         n1_data = None
@@ -41,62 +43,55 @@ def collect_system_data(analyzer, analysis_type='dashboard', n1_results=None):
             'conditions': weather_conditions.get('conditions', 'Clear')
         }
         
-        # Extract line data with actual loading information
-        lines_data = []
-        overloaded_lines = []
-        critical_lines = []
-        caution_lines = []
-        normal_lines = []
+        # Bucket lines by loading in one vectorised pass
+        lines_df = analysis['lines_df']
+        loading = lines_df['loading']
+        status = pd.cut(loading, [-np.inf, 75, 90, 100, np.inf],
+                        labels=['Normal', 'Caution', 'Critical', 'Overloaded'])
+        lines_data = lines_df[['name', 'branch_name', 'loading', 'flow', 'rating', 'voltage',
+                               'conductor', 'bus0', 'bus1']].assign(status=status)
+        groups = lines_data.groupby('status', observed=True)
+        counts = groups.size()
         
-        for line in analysis.get('lines', []):
-            loading = line.get('loading', 0)
-            line_info = {
-                'name': line.get('name', 'Unknown'),
-                'branch_name': line.get('branch_name', 'Unknown'),
-                'loading': loading,
-                'flow': line.get('flow', 0),
-                'rating': line.get('rating', 0),
-                'voltage': line.get('voltage', 0),
-                'conductor': line.get('conductor', 'Unknown'),
-                'bus0': line.get('bus0', ''),
-                'bus1': line.get('bus1', ''),
-                'status': 'Overloaded' if loading > 100 else 'Critical' if loading > 90 else 'Caution' if loading > 75 else 'Normal'
-            }
-            lines_data.append(line_info)       
-     
-            if loading > 100:
-                overloaded_lines.append(line_info)
-            elif loading > 90:
-                critical_lines.append(line_info)
-            elif loading > 75:
-                caution_lines.append(line_info)
-            else:
-                normal_lines.append(line_info)
+        def status_records(label):
+            return groups.get_group(label).to_dict('records') if label in counts.index else []
+        
+        overloaded_lines = status_records('Overloaded')
+        critical_lines = status_records('Critical')
+        caution_count = int(counts.get('Caution', 0))
+        normal_count = int(counts.get('Normal', 0))
         
         # Get system summary
         summary = analysis.get('summary', {})
-        max_loading = max([line.get('loading', 0) for line in analysis.get('lines', [])], default=0)
-        avg_loading = sum([line.get('loading', 0) for line in analysis.get('lines', [])]) / len(analysis.get('lines', [])) if analysis.get('lines') else 0
+        max_loading = loading.max() if len(loading) else 0
+        avg_loading = loading.mean() if len(loading) else 0
         
         # Find most loaded line
-        most_loaded_line = max(analysis.get('lines', []), key=lambda x: x.get('loading', 0), default={})
+        most_loaded_line = lines_df.loc[loading.idxmax()].to_dict() if len(loading) else {}
+        
+        # Format the line lists for the prompt once, while the records are at hand
+        def format_lines(lines):
+            return '\n'.join(f"- {line['name']} ({line['branch_name']}): {line['loading']:.1f}% loading"
+                             for line in lines) or 'None'
         
         # Prepare return data
         result = {
             'weather_data': weather_data,
             'system_status': {
-                'overall_status': 'OVERLOADED' if len(overloaded_lines) > 0 else 'CRITICAL' if len(critical_lines) > 0 else 'CAUTION' if len(caution_lines) > 0 else 'NORMAL',
+                'overall_status': 'OVERLOADED' if len(overloaded_lines) > 0 else 'CRITICAL' if len(critical_lines) > 0 else 'CAUTION' if caution_count > 0 else 'NORMAL',
                 'max_loading': max_loading,
                 'avg_loading': avg_loading,
                 'total_lines': len(lines_data),
                 'overloaded_count': len(overloaded_lines),
                 'critical_count': len(critical_lines),
-                'caution_count': len(caution_lines),
-                'normal_count': len(normal_lines)
+                'caution_count': caution_count,
+                'normal_count': normal_count
             },
-            'lines_data': lines_data,
+            'lines_data': lines_data.to_dict('records'),
             'overloaded_lines': overloaded_lines,
             'critical_lines': critical_lines,
+            '_overloaded_fmt': format_lines(overloaded_lines[:10]),
+            '_critical_fmt': format_lines(critical_lines[:5]),
             'most_loaded_line': most_loaded_line,
             'summary': summary,
             'timestamp': datetime.now().isoformat()
@@ -131,8 +126,6 @@ def create_dashboard_summary_prompt(data):
     try:
         system_status = data.get('system_status', {})
         weather_data = data.get('weather_data', {})
-        overloaded_lines = data.get('overloaded_lines', [])
-        critical_lines = data.get('critical_lines', [])
         most_loaded_line = data.get('most_loaded_line', {})
         
         return f"""
@@ -157,10 +150,10 @@ MOST LOADED LINE:
 - Connection: {most_loaded_line.get('bus0', '')} → {most_loaded_line.get('bus1', '')}
 
 OVERLOADED LINES (>100%):
-{chr(10).join([f"- {line.get('name', 'Unknown')} ({line.get('branch_name', 'Unknown')}): {line.get('loading', 0):.1f}% loading" for line in overloaded_lines[:10]]) if overloaded_lines else "None"}
+{data['_overloaded_fmt']}
 
 CRITICAL LINES (90-100%):
-{chr(10).join([f"- {line.get('name', 'Unknown')} ({line.get('branch_name', 'Unknown')}): {line.get('loading', 0):.1f}% loading" for line in critical_lines[:5]]) if critical_lines else "None"}
+{data['_critical_fmt']}
 
 Please provide:
 1. **System Health Summary** - Overall assessment based on the {system_status.get('overloaded_count', 0)} overloaded lines
@@ -3,9 +3,11 @@
 API route handlers for the AEP Grid Challenge application.
 """
 
-from flask import request, jsonify
+import zlib
+from flask import request
 import numpy as np
-from utils import update_weather_conditions
+from config import MAX_DECOMPRESSED_BODY
+from utils import json_loads, json_response, loading_status, update_weather_conditions
 from ai_service import generate_ai_summary
 
 
@@ -22,7 +24,7 @@ def register_api_routes(app, analyzer):
         update_weather_conditions(temp=temp, wind=wind, conditions='Variable')
         
         results = analyzer.analyze_conditions(temp, wind)
-        return jsonify(results)
+        return json_response(results)
 
     @app.route('/api/gis_data')
     def gis_data():
@@ -35,9 +37,9 @@ def register_api_routes(app, analyzer):
         
         gis_data = analyzer.get_gis_data(temp, wind)
         if gis_data:
-            return jsonify(gis_data)
+            return json_response(gis_data)
         else:
-            return jsonify({'error': 'GIS data not available'})
+            return json_response({'error': 'GIS data not available'})
 
     @app.route('/api/temperature_sweep')
     def temperature_sweep():
@@ -47,19 +49,22 @@ def register_api_routes(app, analyzer):
         # Use the exact method from AEP solution
         temp_results = analyzer.analyze_temperature_impact((25, 60), wind)
         
+        # Status counts come from the same (temperature, line) loading grid
+        loadings = analyzer.loading_grid(temp_results['temperature'].tolist(), wind)
+        
         results = []
-        for _, row in temp_results.iterrows():
-            analysis = analyzer.analyze_conditions(row['temperature'], wind)
+        for row, loading in zip(temp_results.itertuples(index=False), loadings):
+            status = loading_status(loading[~np.isnan(loading)])
             results.append({
-                'temperature': row['temperature'],
-                'critical': analysis['summary']['critical'],
-                'caution': analysis['summary']['caution'],
-                'normal': analysis['summary']['normal'],
-                'max_loading': row['max_loading'],
-                'overloaded_lines': row['overloaded_lines']
+                'temperature': row.temperature,
+                'critical': int((status == 'critical').sum()),
+                'caution': int((status == 'caution').sum()),
+                'normal': int((status == 'normal').sum()),
+                'max_loading': row.max_loading,
+                'overloaded_lines': row.overloaded_lines
             })
         
-        return jsonify(results)
+        return json_response(results)
 
     @app.route('/api/conductor_analysis')
     def conductor_analysis():
@@ -67,75 +72,63 @@ def register_api_routes(app, analyzer):
         temp = float(request.args.get('temp', 50))
         wind = float(request.args.get('wind', 2.0))
         
-        analysis = analyzer.analyze_conditions(temp, wind)
-        
-        # Group by conductor type
-        conductor_stats = {}
-        for line in analysis['lines']:
-            conductor = line['conductor']
-            if conductor not in conductor_stats:
-                conductor_stats[conductor] = {
-                    'count': 0,
-                    'max_loading': 0,
-                    'avg_loading': 0,
-                    'overloaded': 0,
-                    'loadings': []
-                }
-            
-            conductor_stats[conductor]['count'] += 1
-            conductor_stats[conductor]['loadings'].append(line['loading'])
-            conductor_stats[conductor]['max_loading'] = max(conductor_stats[conductor]['max_loading'], line['loading'])
-            if line['loading'] > 100:
-                conductor_stats[conductor]['overloaded'] += 1
-        
-        # Calculate averages
-        for conductor in conductor_stats:
-            conductor_stats[conductor]['avg_loading'] = np.mean(conductor_stats[conductor]['loadings'])
-            del conductor_stats[conductor]['loadings']  # Remove raw data
-        
-        return jsonify(conductor_stats)
+        lines = analyzer.analyze_conditions(temp, wind, as_frame=True, sort=False)['lines_df']
+        
+        # Group by conductor type, factorizing the conductors once for all four statistics
+        conductor_stats = lines.assign(overloaded=lines['loading'] > 100).groupby(
+            'conductor', sort=False).agg(count=('loading', 'size'),
+                                         max_loading=('loading', 'max'),
+                                         avg_loading=('loading', 'mean'),
+                                         overloaded=('overloaded', 'sum'))
+        conductor_stats['max_loading'] = conductor_stats['max_loading'].clip(lower=0)
+        conductor_stats = conductor_stats.to_dict('index')
+        
+        return json_response(conductor_stats)
 
     @app.route('/api/challenge_results')
     def challenge_results():
         """Get the official AEP Challenge results"""
-        return jsonify(analyzer.get_challenge_results())
+        return json_response(analyzer.get_challenge_results())
 
     @app.route('/api/find_first_overload')
     def find_first_overload():
         """Find the first overload temperature and line details"""
         wind = float(request.args.get('wind', 2.0))
         
-        # Find first overload with detailed line information
-        for temp in range(25, 70):
-            analysis = analyzer.analyze_conditions(temp, wind)
+        # First temperature at which any line is above 100%, from the
+        # (temperature, line) loading grid
+        temperatures = range(25, 70)
+        overloaded_at = (analyzer.loading_grid(temperatures, wind) > 100).any(axis=1)
+        
+        if overloaded_at.any():
+            temp = temperatures[int(np.argmax(overloaded_at))]
+            analysis = analyzer.analyze_conditions(temp, wind, as_frame=True, sort=False)
+            loading = analysis['lines_df']['loading'].to_numpy()
+            overloaded = loading > 100
             
-            # Find any overloaded lines (>100%)
-            overloaded_lines = [line for line in analysis['lines'] if line['loading'] > 100]
+            # Get the most overloaded line
+            most_overloaded = analysis['lines_df'].iloc[[np.argmax(loading)]].to_dict('records')[0]
             
-            if overloaded_lines:
-                # Get the most overloaded line
-                most_overloaded = max(overloaded_lines, key=lambda x: x['loading'])
-                
-                return jsonify({
-                    'critical_temperature': temp,
-                    'first_overload_line': {
-                        'name': most_overloaded['name'],
-                        'branch_name': most_overloaded['branch_name'],
-                        'conductor': most_overloaded['conductor'],
-                        'voltage': most_overloaded['voltage'],
-                        'loading': most_overloaded['loading'],
-                        'flow': most_overloaded['flow'],
-                        'rating': most_overloaded['rating'],
-                        'bus0': most_overloaded['bus0'],
-                        'bus1': most_overloaded['bus1']
-                    },
-                    'total_overloaded': len(overloaded_lines),
-                    'wind_speed': wind,
-                    'system_summary': analysis['summary']
-                })
+            return json_response({
+                'critical_temperature': temp,
+                'first_overload_line': {
+                    'name': most_overloaded['name'],
+                    'branch_name': most_overloaded['branch_name'],
+                    'conductor': most_overloaded['conductor'],
+                    'voltage': most_overloaded['voltage'],
+                    'loading': most_overloaded['loading'],
+                    'flow': most_overloaded['flow'],
+                    'rating': most_overloaded['rating'],
+                    'bus0': most_overloaded['bus0'],
+                    'bus1': most_overloaded['bus1']
+                },
+                'total_overloaded': int(overloaded.sum()),
+                'wind_speed': wind,
+                'system_summary': analysis['summary']
+            })
         
         # No overloads found in temperature range
-        return jsonify({
+        return json_response({
             'critical_temperature': None,
             'message': 'No overloads found in temperature range 25-70°C',
             'wind_speed': wind
@@ -152,14 +145,28 @@ def register_api_routes(app, analyzer):
             max_lines = int(max_lines)
         
         results = analyzer.run_enhanced_n1_contingency(temp, wind, max_lines)
-        return jsonify(results)
+        return json_response(results)
 
     @app.route('/api/ai-summary', methods=['POST'])
     def get_ai_summary():
         """Generate AI summary and recommendations using Google Gemini"""
         try:
-            # Get request data
-            data = request.get_json()
+            # Get request data. The body is read and parsed directly; it is
+            # often empty for dashboard summaries, and large N-1 result sets
+            # may be sent gzip-compressed
+            raw = request.get_data(cache=False)
+            if raw and request.content_encoding == 'gzip':
+                # Cap the expanded size so a small gzip bomb can't exhaust memory
+                decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                raw = decompressor.decompress(raw, MAX_DECOMPRESSED_BODY)
+                if decompressor.unconsumed_tail:
+                    return json_response({
+                        'success': False,
+                        'error': 'Decompressed request body is too large'
+                    }, 413)
+                if not decompressor.eof:
+                    raise EOFError('Compressed request body is truncated')
+            data = json_loads(raw) if raw else {}
             summary_type = data.get('type', 'dashboard')  # 'dashboard' or 'n1'
             n1_results = data.get('n1_results', None)  # Optional N-1 results from frontend
             
@@ -167,12 +174,12 @@ def register_api_routes(app, analyzer):
             result = generate_ai_summary(analyzer, summary_type, n1_results)
             
             if result['success']:
-                return jsonify(result)
+                return json_response(result)
             else:
-                return jsonify(result), 400 if 'not configured' in result['error'] else 500
+                return json_response(result, 400 if 'not configured' in result['error'] else 500)
                 
         except Exception as e:
-            return jsonify({
+            return json_response({
                 'success': False,
                 'error': f'AI summary generation failed: {str(e)}'
-            }), 500
\ No newline at end of file
+            }, 500)
\ No newline at end of file
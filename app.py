@@ -1,22 +1,29 @@
 #!/usr/bin/env python3
 
-from flask import Flask, render_template, request, jsonify
+from flask import Flask, render_template, request
 import pandas as pd
 import numpy as np
 import json
-import sys
-import warnings
-warnings.filterwarnings('ignore')
 
-sys.path.append('ieee738')
-from ieee738.ieee738 import ConductorParams
-import ieee738.ieee738 as ieee738
+from ieee738 import ambient_terms, heat_balance_ratings, warm_up
+from utils import conductor_display_names, json_response, loading_status
 
 app = Flask(__name__)
 
+# IEEE 738 ambient conditions other than temperature and wind
+AMBIENT = {
+    'WindAngleDeg': 90, 'SunTime': 12, 'Date': '10 Oct',
+    'Emissivity': 0.8, 'Absorptivity': 0.8, 'Direction': 'EastWest',
+    'Atmosphere': 'Clear', 'Elevation': 1000, 'Latitude': 27
+}
+
+
 class GridAnalyzer:
     def __init__(self):
+        self._qs_per_inch, self._kangle = ambient_terms(**AMBIENT)
         self.load_data()
+        # Compile the rating kernels now rather than on the first request
+        warm_up()
         
     def load_data(self):
         """Load all grid data"""
@@ -25,87 +32,69 @@ class GridAnalyzer:
         self.conductor_df = pd.read_csv('ieee738/conductor_library.csv')
         self.buses_df = pd.read_csv('hawaii40_osu/csv/buses.csv')
         
-        # Merge data
+        # Give the string join keys one shared categorical dtype per key so
+        # the merges match integer codes instead of hashing strings (bus ids
+        # are already integers)
+        line_names = pd.CategoricalDtype(self.lines_df['name'].unique())
+        conductor_names = pd.CategoricalDtype(self.conductor_df['ConductorName'].unique())
+        self.lines_df = self.lines_df.astype({'name': line_names, 'conductor': conductor_names})
+        self.flows_df = self.flows_df.astype({'name': line_names})
+        self.conductor_df = self.conductor_df.astype({'ConductorName': conductor_names})
+        
+        # Merge data, dropping the duplicated key columns of the right-hand tables
         self.grid_data = self.lines_df.merge(self.flows_df, on='name')
         self.grid_data = self.grid_data.merge(self.conductor_df, left_on='conductor', right_on='ConductorName')
         self.grid_data = self.grid_data.merge(self.buses_df[['name', 'v_nom']], left_on='bus0', right_on='name', suffixes=('', '_bus'))
+        self.grid_data = self.grid_data.drop(columns=['ConductorName', 'name_bus'])
+        self.grid_data['conductor_display'] = conductor_display_names(self.grid_data['conductor'])
         
-    def calculate_rating(self, conductor_name, mot, temp, wind):
-        """Calculate IEEE 738 rating"""
-        conductor_row = self.conductor_df[self.conductor_df['ConductorName'] == conductor_name].iloc[0]
+        # Per-line arrays for the vectorized rating calculation
+        self._rlo = (self.grid_data['RES_25C'] / 5280).to_numpy(np.float64)
+        self._rhi = (self.grid_data['RES_50C'] / 5280).to_numpy(np.float64)
+        self._diam_in = (self.grid_data['CDRAD_in'] * 2).to_numpy(np.float64)
+        self._mot = self.grid_data['MOT'].to_numpy(np.float64)
+        self._v_nom = self.grid_data['v_nom'].to_numpy(np.float64)
+        # Three-phase rating (MVA) per amp: sqrt(3) * V(kV) * 1000 / 1e6
+        self._mva_factor = np.sqrt(3.0) * self._v_nom / 1000.0
+        self._p0 = self.grid_data['p0_nominal'].to_numpy(np.float64)
         
-        params = {
-            'Ta': temp, 'WindVelocity': wind, 'TLo': 25, 'THi': 50,
-            'RLo': conductor_row['RES_25C'] / 5280, 'RHi': conductor_row['RES_50C'] / 5280,
-            'Diameter': conductor_row['CDRAD_in'] * 2, 'Tc': mot,
-            'WindAngleDeg': 90, 'SunTime': 12, 'Date': '10 Oct',
-            'Emissivity': 0.8, 'Absorptivity': 0.8, 'Direction': 'EastWest',
-            'Atmosphere': 'Clear', 'Elevation': 1000, 'Latitude': 27
-        }
+    def analyze_conditions(self, temp, wind, sort=True):
+        """Analyze grid under given conditions, most loaded line first unless sort=False"""
+        # Rate every line in one batched IEEE 738 calculation; lines without
+        # a positive rating are left out
+        rating_amps = heat_balance_ratings(float(temp), float(wind), self._mot, self._diam_in,
+                                           25.0, self._rlo, 50.0, self._rhi, self._qs_per_inch,
+                                           float(AMBIENT['Emissivity']), float(AMBIENT['Elevation']),
+                                           self._kangle)
+        rated = rating_amps > 0
+        rating_mva = rating_amps[rated] * self._mva_factor[rated]
+        loading = (self._p0[rated] / rating_mva) * 100
+        status = loading_status(loading)
         
-        try:
-            cp = ConductorParams(**params)
-            conductor = ieee738.Conductor(cp)
-            return conductor.steady_state_thermal_rating()
-        except:
-            return None
-    
-    def analyze_conditions(self, temp, wind):
-        """Analyze grid under given conditions"""
-        results = []
-        critical_count = 0
-        caution_count = 0
-        normal_count = 0
-        
-        for _, line in self.grid_data.iterrows():
-            rating_amps = self.calculate_rating(line['conductor'], line['MOT'], temp, wind)
-            if rating_amps:
-                rating_mva = np.sqrt(3) * rating_amps * line['v_nom'] * 1000 / 1e6
-                loading = (line['p0_nominal'] / rating_mva) * 100
-                
-                if loading >= 90:
-                    status = 'critical'
-                    critical_count += 1
-                elif loading >= 60:
-                    status = 'caution'
-                    caution_count += 1
-                else:
-                    status = 'normal'
-                    normal_count += 1
-                
-                # Create a cleaner conductor display name
-                conductor_display = line['conductor']
-                if 'ACSR' in conductor_display:
-                    # Extract the main size and bird code name
-                    parts = conductor_display.split()
-                    if len(parts) >= 4:  # e.g., "3/0 ACSR 6/1 PIGEON"
-                        size = parts[0]  # "3/0" or "336.4"
-                        bird_name = parts[-1]  # "PIGEON", "DOVE", etc.
-                        conductor_display = f"{size} {bird_name}"
-                    elif len(parts) >= 2:  # fallback
-                        conductor_display = f"{parts[0]} {parts[-1]}"
-                
-                results.append({
-                    'name': line['name'],
-                    'branch_name': line['branch_name'],
-                    'conductor': line['conductor'],
-                    'conductor_display': conductor_display,
-                    'voltage': line['v_nom'],
-                    'flow': line['p0_nominal'],
-                    'rating': rating_mva,
-                    'loading': loading,
-                    'status': status
-                })
+        lines = self.grid_data[rated]
+        results = pd.DataFrame({
+            'name': lines['name'].values,
+            'branch_name': lines['branch_name'].values,
+            'conductor': lines['conductor'].values,
+            'conductor_display': lines['conductor_display'].values,
+            'voltage': self._v_nom[rated],
+            'flow': self._p0[rated],
+            'rating': rating_mva,
+            'loading': loading,
+            'status': status
+        })
+        if sort:
+            results = results.sort_values('loading', ascending=False, kind='stable')
         
         return {
-            'lines': sorted(results, key=lambda x: x['loading'], reverse=True),
+            'lines': results.to_dict('records'),
             'summary': {
-                'critical': critical_count,
-                'caution': caution_count,
-                'normal': normal_count,
+                'critical': int((status == 'critical').sum()),
+                'caution': int((status == 'caution').sum()),
+                'normal': int((status == 'normal').sum()),
                 'total': len(results),
-                'max_loading': max([r['loading'] for r in results]),
-                'avg_loading': np.mean([r['loading'] for r in results])
+                'max_loading': loading.max(),
+                'avg_loading': np.mean(loading)
             }
         }
 
@@ -124,12 +113,12 @@ def analyze():
     wind = float(request.args.get('wind', 2.0))
     
     results = analyzer.analyze_conditions(temp, wind)
-    return jsonify(results)
+    return json_response(results)
 
 @app.route('/api/system_info')
 def system_info():
     """Get basic system information"""
-    return jsonify({
+    return json_response({
         'buses': len(analyzer.buses_df),
         'lines': len(analyzer.lines_df),
         'conductors': len(analyzer.conductor_df),
@@ -145,7 +134,7 @@ def temperature_sweep():
     
     results = []
     for temp in temps:
-        analysis = analyzer.analyze_conditions(temp, wind)
+        analysis = analyzer.analyze_conditions(temp, wind, sort=False)
         results.append({
             'temperature': temp,
             'critical': analysis['summary']['critical'],
@@ -154,7 +143,7 @@ def temperature_sweep():
             'max_loading': analysis['summary']['max_loading']
         })
     
-    return jsonify(results)
+    return json_response(results)
 
 if __name__ == '__main__':
     app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -22,6 +22,9 @@ INITIAL_WEATHER_CONDITIONS = {
     'conditions': 'Clear'
 }
 
+# Largest request body accepted after gzip decompression (bytes)
+MAX_DECOMPRESSED_BODY = 16 * 1024 * 1024
+
 # GIS data file paths
 GIS_LINES_PATH = 'hawaii40_osu/gis/oneline_lines.geojson'
 GIS_BUSES_PATH = 'hawaii40_osu/gis/oneline_busses.geojson'
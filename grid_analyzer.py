@@ -3,13 +3,25 @@
 Grid analyzer class and related functionality for the AEP Grid Challenge application.
 """
 
+from functools import lru_cache
+import json
 import pandas as pd
 import numpy as np
-import json
-import pypsa
-from aep_challenge_solution import AEPGridChallenge
+from joblib import Parallel, delayed
+from aep_challenge_solution import N1_JOBS, N1_SCREEN_LOADING, AEPGridChallenge, contingency_flows
+from ieee738 import warm_up
 from config import GIS_LINES_PATH, GIS_BUSES_PATH
+from utils import conductor_display_names, json_loads, loading_status
+
+# Per-line fields reported by FlaskGridAnalyzer.analyze_conditions
+LINE_RESULT_COLUMNS = ['name', 'branch_name', 'conductor', 'conductor_display', 'voltage',
+                       'flow', 'rating', 'loading', 'status', 'bus0', 'bus1']
 
+# GIS properties of lines without loading information
+GIS_NO_DATA = {'loading': 0, 'status': 'normal', 'rating': 0, 'flow': 0}
+
+# Number of analyze_conditions results kept per analyzer, least recently used evicted first
+ANALYSIS_CACHE_SIZE = 512
 
 class FlaskGridAnalyzer(AEPGridChallenge):
     """Flask wrapper for AEP Challenge solution"""
@@ -17,78 +29,94 @@ class FlaskGridAnalyzer(AEPGridChallenge):
     def __init__(self):
         super().__init__()
         self.load_gis_data()
+        # Compile the rating kernels now rather than on the first request
+        warm_up()
+        
+    def load_data(self):
+        """Load all grid data, dropping analyses of previously loaded data"""
+        super().load_data()
+        self.grid_data['conductor_display'] = conductor_display_names(self.grid_data['conductor'])
+        self._analysis_cache = {}
         
+        # grid_data rows as dicts, for the N-1 result records
+        self._line_records = self.grid_data.to_dict('records')
+    
     def load_gis_data(self):
         """Load GIS data for mapping"""
         try:
-            with open(GIS_LINES_PATH, 'r') as f:
-                self.gis_lines = json.load(f)
-            with open(GIS_BUSES_PATH, 'r') as f:
-                self.gis_buses = json.load(f)
-        except:
+            with open(GIS_LINES_PATH, 'rb') as f:
+                self.gis_lines = json_loads(f.read())
+            with open(GIS_BUSES_PATH, 'rb') as f:
+                self.gis_buses = json_loads(f.read())
+        except (FileNotFoundError, json.JSONDecodeError):
             self.gis_lines = None
             self.gis_buses = None
+        
+        # Line features as served without loading information, and the
+        # (position, feature) pairs of each line name
+        features = self.gis_lines['features'] if self.gis_lines else []
+        self._gis_default_features = [{**feature, 'properties': {**feature['properties'], **GIS_NO_DATA}}
+                                      for feature in features]
+        self._gis_features_by_name = {}
+        for i, feature in enumerate(features):
+            self._gis_features_by_name.setdefault(feature['properties'].get('Name', ''), []).append((i, feature))
     
-    def analyze_conditions(self, temp, wind):
-        """Analyze grid conditions using AEP solution methods"""
-        results = []
-        critical_count = 0
-        caution_count = 0
-        normal_count = 0
+    def analyze_conditions(self, temp, wind, as_frame=False, sort=True):
+        """Analyze grid conditions using AEP solution methods
         
-        for _, line in self.grid_data.iterrows():
-            rating_amps = self.calculate_dynamic_rating(line['conductor'], line['MOT'], temp, wind)
-            if rating_amps:
-                rating_mva = np.sqrt(3) * rating_amps * line['v_nom'] * 1000 / 1e6
-                loading = (line['p0_nominal'] / rating_mva) * 100
-                
-                if loading >= 90:
-                    status = 'critical'
-                    critical_count += 1
-                elif loading >= 60:
-                    status = 'caution'
-                    caution_count += 1
-                else:
-                    status = 'normal'
-                    normal_count += 1 
-               
-                # Create a cleaner conductor display name
-                conductor_display = line['conductor']
-                if 'ACSR' in conductor_display:
-                    # Extract the main size and bird code name
-                    parts = conductor_display.split()
-                    if len(parts) >= 4:  # e.g., "3/0 ACSR 6/1 PIGEON"
-                        size = parts[0]  # "3/0" or "336.4"
-                        bird_name = parts[-1]  # "PIGEON", "DOVE", etc.
-                        conductor_display = f"{size} {bird_name}"
-                    elif len(parts) >= 2:  # fallback
-                        conductor_display = f"{parts[0]} {parts[-1]}"
-                
-                results.append({
-                    'name': line['name'],
-                    'branch_name': line['branch_name'],
-                    'conductor': line['conductor'],
-                    'conductor_display': conductor_display,
-                    'voltage': line['v_nom'],
-                    'flow': line['p0_nominal'],
-                    'rating': rating_mva,
-                    'loading': loading,
-                    'status': status,
-                    'bus0': line['bus0'],
-                    'bus1': line['bus1']
-                })
+        Lines are returned as a list of dicts under 'lines' or, with
+        as_frame=True, as a DataFrame under 'lines_df'; most loaded first
+        unless sort=False, which keeps grid_data order. Results are cached
+        per (temp, wind), so callers must not modify them.
+        """
+        return self._lru_cached(
+            self._analysis_cache, (float(temp), float(wind), as_frame, sort), ANALYSIS_CACHE_SIZE,
+            lambda: self._analyze_conditions(temp, wind, as_frame, sort))
+    
+    def _analyze_conditions(self, temp, wind, as_frame, sort):
+        """Uncached analyze_conditions"""
+        # Rate every line in one batched IEEE 738 calculation; lines without
+        # a positive rating are left out
+        rating_amps = self.calculate_dynamic_ratings(temp, wind)
+        rated = rating_amps > 0
         
-        return {
-            'lines': sorted(results, key=lambda x: x['loading'], reverse=True),
-            'summary': {
-                'critical': critical_count,
-                'caution': caution_count,
-                'normal': normal_count,
-                'total': len(results),
-                'max_loading': max([r['loading'] for r in results]) if results else 0,
-                'avg_loading': np.mean([r['loading'] for r in results]) if results else 0
-            }
+        lines = self.grid_data[rated]
+        v_nom = lines['v_nom'].to_numpy(np.float64)
+        flow = lines['p0_nominal'].to_numpy(np.float64)
+        rating_mva = rating_amps[rated] * self._mva_factor[rated]
+        loading = (flow / rating_mva) * 100
+        status = loading_status(loading)
+        
+        results = pd.DataFrame({
+            'name': lines['name'].values,
+            'branch_name': lines['branch_name'].values,
+            'conductor': lines['conductor'].values,
+            'conductor_display': lines['conductor_display'].values,
+            'voltage': v_nom,
+            'flow': flow,
+            'rating': rating_mva,
+            'loading': loading,
+            'status': status,
+            'bus0': lines['bus0'].values,
+            'bus1': lines['bus1'].values
+        }, columns=LINE_RESULT_COLUMNS)
+        
+        summary = {
+            'critical': int((status == 'critical').sum()),
+            'caution': int((status == 'caution').sum()),
+            'normal': int((status == 'normal').sum()),
+            'total': len(results),
+            'max_loading': loading.max() if len(loading) else 0,
+            'avg_loading': np.mean(loading) if len(loading) else 0
         }
+        
+        if sort:
+            # Stable, so lines with equal loading keep grid_data order
+            results = results.sort_values('loading', ascending=False, kind='stable', ignore_index=True)
+        
+        if as_frame:
+            return {'lines_df': results, 'summary': summary}
+        return {'lines': results.to_dict('records'), 'summary': summary}
     
     def get_contingency_status(self, max_loading):
         """Determine contingency status based on maximum loading"""
@@ -102,39 +130,36 @@ class FlaskGridAnalyzer(AEPGridChallenge):
             return 'NORMAL'    
 
     def get_gis_data(self, temp, wind):
-        """Get GIS data with loading information for interactive map"""
+        """Get GIS data with loading information for interactive map
+        
+        Features are shared with self.gis_lines and between calls, so
+        callers must not modify them.
+        """
         if not self.gis_lines:
             return None
             
         analysis = self.analyze_conditions(temp, wind)
-        line_loadings = {line['name']: line for line in analysis['lines']}
-        
-        # Create a copy to avoid modifying original
-        gis_data = json.loads(json.dumps(self.gis_lines))
         
-        # Add loading info to GIS features
-        for feature in gis_data['features']:
-            line_name = feature['properties'].get('Name', '')
-            if line_name in line_loadings:
-                loading_info = line_loadings[line_name]
-                feature['properties']['loading'] = loading_info['loading']
-                feature['properties']['status'] = loading_info['status']
-                feature['properties']['rating'] = loading_info['rating']
-                feature['properties']['flow'] = loading_info['flow']
-                feature['properties']['conductor'] = loading_info['conductor']
-            else:
-                # Default values for lines without data
-                feature['properties']['loading'] = 0
-                feature['properties']['status'] = 'normal'
-                feature['properties']['rating'] = 0
-                feature['properties']['flow'] = 0
+        # Start from the no-data features and overlay loading info on
+        # shallow copies of just the features of analyzed lines
+        features = list(self._gis_default_features)
+        for line in analysis['lines']:
+            for i, feature in self._gis_features_by_name.get(line['name'], ()):
+                features[i] = {**feature, 'properties': {
+                    **feature['properties'],
+                    'loading': line['loading'],
+                    'status': line['status'],
+                    'rating': line['rating'],
+                    'flow': line['flow'],
+                    'conductor': line['conductor']
+                }}
         
-        return gis_data
+        return {**self.gis_lines, 'features': features}
     
     def get_challenge_results(self):
         """Get the key challenge results"""
         critical_temp = self.find_critical_temperature()
-        critical_lines = self.identify_critical_lines(50)
+        critical_lines = self.identify_critical_lines(50, top_n=5)
         
         # System stress at different temperatures
         stress_results = []
@@ -151,105 +176,158 @@ class FlaskGridAnalyzer(AEPGridChallenge):
         
         return {
             'critical_temperature': critical_temp,
-            'most_critical_lines': critical_lines.head(5).to_dict('records'),
+            'most_critical_lines': critical_lines.to_dict('records'),
             'stress_progression': stress_results
         }    
 
+    def _contingency_name(self, line_out):
+        """Branch name of line_out, or line_out itself if it is not in grid_data"""
+        j = self._line_names.get_indexer([line_out])[0]
+        return self._line_records[self._line_pos[j]]['branch_name'] if j >= 0 else line_out
+    
+    def _evaluate_enhanced_contingency(self, line_out, flows, error, line_ratings):
+        """Contingency result and violations for the loss of line_out
+        
+        flows and error are what contingency_flows() returned for it;
+        line_ratings are the ratings (MVA) of the grid_data lines, NaN
+        where there is none.
+        """
+        if error is not None:
+            result = {
+                'contingency_line': line_out,
+                'contingency_name': self._contingency_name(line_out),
+                'violations': [],
+                'violation_count': 0,
+                'max_loading': 0.0,
+                'estimated': False,
+                'status': 'ERROR',
+                'error': error
+            }
+            return result, []
+        
+        violations = []
+        
+        # Loadings of the flowing lines that are in grid_data and rated,
+        # in flows order
+        idx = self._line_names.get_indexer(flows.index)
+        known = idx >= 0
+        rows = self._line_pos[idx[known]]
+        rating_mva = line_ratings[rows]
+        rated = rating_mva > 0
+        rows = rows[rated]
+        flow = np.abs(flows.to_numpy()[known][rated])
+        rating_mva = rating_mva[rated]
+        loading = (flow / rating_mva) * 100
+        max_loading = float(loading.max(initial=0.0, where=~np.isnan(loading)))
+        
+        line_violations = []
+        over = np.flatnonzero(loading > 80)
+        for row, loading_pct, flow_mw, rating in zip(rows[over].tolist(), loading[over].tolist(),
+                                                     flow[over].tolist(), rating_mva[over].tolist()):
+            line_data = self._line_records[row]
+            line_violations.append({
+                'line_name': line_data['name'],
+                'branch_name': line_data['branch_name'],
+                'loading_pct': loading_pct,
+                'flow': flow_mw,
+                'rating': rating,
+                'conductor': line_data['conductor'],
+                'voltage': line_data['v_nom'],
+                'bus0': str(line_data['bus0']),
+                'bus1': str(line_data['bus1'])
+            })
+        
+        # Store contingency result
+        result = {
+            'contingency_line': line_out,
+            'contingency_name': self._contingency_name(line_out),
+            'violations': line_violations,
+            'violation_count': len(line_violations),
+            'max_loading': max_loading,
+            'estimated': False,
+            'status': self.get_contingency_status(max_loading) if len(line_violations) > 0 else 'NORMAL'
+        }
+        
+        # Add to violations list
+        for violation in line_violations:
+            violations.append({
+                'contingency': line_out,
+                'contingency_name': result['contingency_name'],
+                'overloaded_line': violation['line_name'],
+                'overloaded_line_name': violation['branch_name'],
+                'loading_pct': violation['loading_pct'],
+                'flow': violation['flow'],
+                'rating': violation['rating'],
+                'conductor': violation['conductor'],
+                'voltage': violation['voltage'],
+                'bus0': violation['bus0'],
+                'bus1': violation['bus1']
+            })
+        
+        return result, violations
+    
     def run_enhanced_n1_contingency(self, ambient_temp=35, wind_speed=2.0, max_lines=None):
         """Enhanced N-1 Contingency Analysis for Flask interface"""
         try:
-            # Load PyPSA network
-            network = pypsa.Network()
-            network.import_from_csv_folder('hawaii40_osu/csv')
-            network.pf()
+            # Solved base case and its line outage distribution factors
+            network, base_flows, lodf = self._base_case()
+            
+            rating_amps = self.calculate_dynamic_ratings(ambient_temp, wind_speed)
+            line_ratings = pd.Series(np.where(rating_amps > 0, rating_amps * self._mva_factor, np.nan),
+                                     index=self.grid_data['name'])
             
             violations = []
             contingency_results = []
+            flagged = []
             
             # Get list of lines to test
             lines_to_test = network.lines.index[:max_lines] if max_lines else network.lines.index
             
             for line_out in lines_to_test:
-                # Create contingency network
-                cont_network = network.copy()
-                cont_network.lines.drop(line_out, inplace=True)
-                
-                try:
-                    cont_network.pf()
-                    
-                    # Check post-contingency loadings
-                    flows = cont_network.lines_t.p0.iloc[0]
-                    line_violations = []
-                    max_loading = 0
-                    
-                    for line_name, flow in flows.items():
-                        if line_name in self.grid_data['name'].values:
-                            line_data = self.grid_data[self.grid_data['name'] == line_name].iloc[0]
-                            rating_amps = self.calculate_dynamic_rating(line_data['conductor'], line_data['MOT'], ambient_temp, wind_speed)
-                            
-                            if rating_amps:
-                                rating_mva = np.sqrt(3) * rating_amps * line_data['v_nom'] * 1000 / 1e6
-                                loading_pct = (abs(flow) / rating_mva) * 100
-                                max_loading = max(max_loading, loading_pct)
-                                
-                                if loading_pct > 80:
-                                    line_violations.append({
-                                        'line_name': str(line_name),
-                                        'branch_name': str(line_data['branch_name']),
-                                        'loading_pct': float(loading_pct),
-                                        'flow': float(abs(flow)),
-                                        'rating': float(rating_mva),
-                                        'conductor': str(line_data['conductor']),
-                                        'voltage': float(line_data['v_nom']),
-                                        'bus0': str(line_data['bus0']),
-                                        'bus1': str(line_data['bus1'])
-                                    })  
-                  
-                    # Store contingency result
-                    contingency_results.append({
-                        'contingency_line': str(line_out),
-                        'contingency_name': str(self.grid_data[self.grid_data['name'] == line_out]['branch_name'].iloc[0]) if line_out in self.grid_data['name'].values else str(line_out),
-                        'violations': line_violations,
-                        'violation_count': int(len(line_violations)),
-                        'max_loading': float(max_loading),
-                        'status': self.get_contingency_status(max_loading) if len(line_violations) > 0 else 'NORMAL'
-                    })
-                    
-                    # Add to violations list
-                    for violation in line_violations:
-                        violations.append({
-                            'contingency': str(line_out),
-                            'contingency_name': str(contingency_results[-1]['contingency_name']),
-                            'overloaded_line': str(violation['line_name']),
-                            'overloaded_line_name': str(violation['branch_name']),
-                            'loading_pct': float(violation['loading_pct']),
-                            'flow': float(violation['flow']),
-                            'rating': float(violation['rating']),
-                            'conductor': str(violation['conductor']),
-                            'voltage': float(violation['voltage']),
-                            'bus0': str(violation['bus0']),
-                            'bus1': str(violation['bus1'])
-                        })
-                        
-                except Exception as e:
+                # Estimate post-contingency flows with the outage factors; a
+                # contingency that keeps every line well below the violation
+                # limit (and does not island the network) needs no AC power
+                # flow, and its max_loading is the estimate (flagged as such)
+                factors = lodf[line_out]
+                est_flows = (base_flows + factors * base_flows[line_out]).drop(line_out)
+                est_loading = est_flows.abs() / line_ratings.reindex(est_flows.index) * 100
+                if np.isfinite(factors).all() and not (est_loading > N1_SCREEN_LOADING).any():
+                    est_max = est_loading.max()
                     contingency_results.append({
-                        'contingency_line': str(line_out),
-                        'contingency_name': str(self.grid_data[self.grid_data['name'] == line_out]['branch_name'].iloc[0]) if line_out in self.grid_data['name'].values else str(line_out),
+                        'contingency_line': line_out,
+                        'contingency_name': self._contingency_name(line_out),
                         'violations': [],
-                        'violation_count': int(0),
-                        'max_loading': float(0),
-                        'status': 'ERROR',
-                        'error': str(e)
+                        'violation_count': 0,
+                        'max_loading': float(est_max) if est_max > 0 else 0.0,
+                        'estimated': True,
+                        'status': 'NORMAL'
                     })
                     continue
+                
+                flagged.append(line_out)
+                contingency_results.append(None)
+            
+            # Contingencies are independent, so run the flagged power flows
+            # in worker processes (each only gets the line to switch out)
+            # and slot the evaluated results back in line order
+            solved = iter(zip(flagged, Parallel(n_jobs=N1_JOBS, backend='loky')(
+                delayed(contingency_flows)('hawaii40_osu/csv', line_out)
+                for line_out in flagged
+            )))
+            for i, result in enumerate(contingency_results):
+                if result is None:
+                    line_out, (flows, error) = next(solved)
+                    contingency_results[i], line_violations = self._evaluate_enhanced_contingency(
+                        line_out, flows, error, line_ratings.to_numpy())
+                    violations.extend(line_violations)
             
             return {
                 'violations': sorted(violations, key=lambda x: x['loading_pct'], reverse=True),
                 'contingency_results': sorted(contingency_results, key=lambda x: x['violation_count'], reverse=True),
                 'summary': {
-                    'total_contingencies': int(len(contingency_results)),
-                    'critical_contingencies': int(len([c for c in contingency_results if c['status'] == 'CRITICAL'])),
-                    'total_violations': int(len(violations)),
+                    'total_contingencies': len(contingency_results),
+                    'critical_contingencies': len([c for c in contingency_results if c['status'] == 'CRITICAL']),
+                    'total_violations': len(violations),
                     'temperature': float(ambient_temp),
                     'wind_speed': float(wind_speed)
                 }
@@ -261,10 +339,16 @@ class FlaskGridAnalyzer(AEPGridChallenge):
                 'violations': [],
                 'contingency_results': [],
                 'summary': {
-                    'total_contingencies': int(0),
-                    'critical_contingencies': int(0),
-                    'total_violations': int(0),
+                    'total_contingencies': 0,
+                    'critical_contingencies': 0,
+                    'total_violations': 0,
                     'temperature': float(ambient_temp),
                     'wind_speed': float(wind_speed)
                 }
-            }
\ No newline at end of file
+            }
+
+
+@lru_cache(maxsize=1)
+def get_analyzer():
+    """The process-wide FlaskGridAnalyzer, created on first use"""
+    return FlaskGridAnalyzer()
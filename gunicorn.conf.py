@@ -0,0 +1,20 @@
+#!/usr/bin/env python3
+"""
+Gunicorn configuration for the AEP Grid Challenge application.
+"""
+
+import os
+from config import FLASK_CONFIG
+
+bind = f"{FLASK_CONFIG['host']}:{FLASK_CONFIG['port']}"
+
+# Import the app, and with it the analyzer and compiled rating kernels,
+# once in the master; forked workers share it copy-on-write
+preload_app = True
+workers = os.cpu_count() or 1
+worker_class = 'gthread'
+threads = 4
+
+# Split the cores between workers for the N-1 power flow pools (read when
+# the app is imported, which preload_app does after this file)
+os.environ.setdefault('N1_JOBS', str(max(1, (os.cpu_count() or 1) // workers)))
@@ -0,0 +1,3 @@
+"""IEEE 738 current-temperature relationship of bare overhead conductors."""
+from .ieee738 import (Conductor, ConductorParams, ambient_terms, heat_balance_rating,
+                      heat_balance_ratings, steady_state_thermal_rating, warm_up)
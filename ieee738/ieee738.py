@@ -10,9 +10,19 @@ import math as m
 from datetime import datetime
 import logging
 import pdb
+import numpy as np
 from pydantic import BaseModel, Field
 from typing import Literal, Optional
 
+try:
+    from numba import njit
+except ImportError:
+    # numba is optional: without it the compiled kernels run as plain Python
+    def njit(*args, **kwargs):
+        if len(args) == 1 and callable(args[0]):
+            return args[0]
+        return lambda func: func
+
 logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 logger.info("Logging init")
@@ -24,6 +34,94 @@ def polyval(p, x):
         result += p[i] * x**(N-i-1)
     return result
 
+# fastmath without 'nnan'/'ninf' so NaN can still flag inputs the solver rejects
+@njit(fastmath={'nsz', 'arcp', 'contract', 'afn', 'reassoc'}, nogil=True, cache=True)
+def heat_balance_rating(Ta, WindVelocity, Tc, Diameter, TLo, RLo, THi, RHi,
+                        qs, Emissivity, Elevation, Kangle):
+    """Compiled core of Conductor.steady_state_thermal_rating() for one conductor.
+
+    The heat balance qc + qr = qs + I^2*R(Tc) is solved for I in closed form.
+    qs is the solar heat gain (W/ft) and Kangle the wind direction factor,
+    both of which are independent of Ta, WindVelocity and Tc. Returns NaN
+    where steady_state_thermal_rating() raises ValueError and 0 where the
+    balance has no real solution. Absorptivity only enters through qs, so
+    whoever computes qs must reject a negative one.
+    """
+    if RLo > 0.001 or RHi > 0.001 or Emissivity < 0:
+        return m.nan
+    D = Diameter
+    Vwind = WindVelocity * 60.0 * 60.0
+    pf_elev = 0.080695 - 2.901e-6*Elevation + 3.7e-11*Elevation**2
+
+    # Natural convection (evaluates air density before clamping Tc)
+    Tfilm = (Tc + Ta) / 2.0
+    pf = pf_elev / (1 + 0.00367*Tfilm)
+    if Tc - Ta < 0:
+        Tc = Ta + 0.1
+    qcn = 0.283 * pf**0.5 * D**0.75 * (Tc - Ta)**1.25
+
+    # Forced convection
+    Tfilm = (Tc + Ta) / 2.0
+    pf = pf_elev / (1 + 0.00367*Tfilm)
+    uf = (0.00353*(Tfilm + 273.0)**1.5) / (Tfilm + 383.4)
+    kf = -1.343e-9*Tfilm**2 + 2.279e-5*Tfilm + 7.388e-3
+    qc1 = (1.01 + 0.371*((D*pf*Vwind)/uf)**0.52) * kf * (Tc - Ta)
+    qc2 = 0.1695*(D*pf*Vwind/uf)**0.6 * kf * (Tc - Ta)
+    qc = max(qcn, max(qc1*Kangle, qc2*Kangle))
+
+    qr = 0.138 * D * Emissivity * (((Tc + 273.0)/100.0)**4 - ((Ta + 273.0)/100.0)**4)
+    rTc = RLo + ((RHi - RLo) / (THi - TLo))*(Tc - TLo)
+
+    # qr is zero exactly when a factor is; test Tc == Ta directly since
+    # fastmath may reassociate the T^4 difference away from an exact zero
+    if qs == 0 or D == 0 or Emissivity == 0 or Tc == Ta:
+        return m.nan
+    if qc + qr - qs < 0:
+        return 0.0
+    return m.sqrt((qc + qr - qs)/rTc)
+
+# Serial on purpose: at grid sizes a parallel loop is slower, and starting
+# numba's threading layer at import would break gunicorn's preload + fork
+@njit(nogil=True, cache=True)
+def heat_balance_ratings(Ta, WindVelocity, Tc, Diameter, TLo, RLo, THi, RHi,
+                         qs_per_inch, Emissivity, Elevation, Kangle):
+    """heat_balance_rating() of many conductors at one ambient condition.
+
+    Tc, Diameter, RLo and RHi are arrays with one entry per conductor; the
+    solar heat gain is given per inch of diameter.
+    """
+    n = Tc.shape[0]
+    I = np.empty(n)
+    for i in range(n):
+        I[i] = heat_balance_rating(Ta, WindVelocity, Tc[i], Diameter[i], TLo, RLo[i], THi, RHi[i],
+                                   qs_per_inch * Diameter[i], Emissivity, Elevation, Kangle)
+    return I
+
+def warm_up():
+    """Compile (or load from numba's cache) the rating kernels ahead of their first real use"""
+    ones = np.ones(1)
+    heat_balance_rating(25.0, 2.0, 75.0, 1.0, 25.0, 2e-5, 50.0, 2.2e-5, 1.0, 0.8, 1000.0, 1.0)
+    heat_balance_ratings(25.0, 2.0, 75.0*ones, ones, 25.0, 2e-5*ones, 50.0, 2.2e-5*ones,
+                         1.0, 0.8, 1000.0, 1.0)
+
+def ambient_terms(**ambient):
+    """Solar heat gain per inch of diameter (W/ft) and Kangle for the given ambient fields.
+
+    Neither term depends on Ta, WindVelocity or the conductor, so both can
+    be computed once and passed to heat_balance_rating(s).
+    """
+    params = {'Ta': 25.0, 'WindVelocity': 0.0, 'Tc': 50.0, 'TLo': 25.0, 'RLo': 0.0,
+              'THi': 50.0, 'RHi': 0.0, **ambient, 'Diameter': 1.0}
+    cp = ConductorParams(**params)
+    qs_per_inch = Conductor(cp).solar_heat_gain()
+    w = deg2rad(90 - cp.WindAngleDeg)
+    Kangle = 1.194 - m.sin(w) - 0.194*m.cos(2*w) + 0.368*m.sin(2*w)
+    return qs_per_inch, Kangle
+
+def steady_state_thermal_rating(**params):
+    """Conductor rating in Amps for the given ConductorParams fields"""
+    return Conductor(ConductorParams(**params)).steady_state_thermal_rating()
+
 def rad2deg(rad):
     return rad*180.0/m.pi
 
@@ -4,16 +4,17 @@ Main Flask application for the AEP Grid Challenge.
 """
 
 from flask import Flask, render_template
-from grid_analyzer import FlaskGridAnalyzer
+from grid_analyzer import get_analyzer
 from api_routes import register_api_routes
-from utils import update_global_data
+from utils import OrjsonProvider, update_global_data
 from config import FLASK_CONFIG
 
 # Initialize Flask app
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 
 # Initialize analyzer with AEP solution
-analyzer = FlaskGridAnalyzer()
+analyzer = get_analyzer()
 
 # Initialize global data
 update_global_data(analyzer)
@@ -1,35 +1,41 @@
 #!/usr/bin/env python3
 
+from functools import lru_cache
 import pypsa
 import pandas as pd
 import numpy as np
-import sys
 import warnings
 warnings.filterwarnings('ignore')
 
-sys.path.append('ieee738')
-from ieee738.ieee738 import ConductorParams
-import ieee738.ieee738 as ieee738
+from ieee738 import ambient_terms, heat_balance_rating
 
-def calculate_rating(conductor_name, mot, temp, wind, conductor_df):
-    """Calculate IEEE 738 rating"""
-    conductor_row = conductor_df[conductor_df['ConductorName'] == conductor_name].iloc[0]
-    
-    params = {
-        'Ta': temp, 'WindVelocity': wind, 'TLo': 25, 'THi': 50,
-        'RLo': conductor_row['RES_25C'] / 5280, 'RHi': conductor_row['RES_50C'] / 5280,
-        'Diameter': conductor_row['CDRAD_in'] * 2, 'Tc': mot,
-        'WindAngleDeg': 90, 'SunTime': 12, 'Date': '12 Jun',
-        'Emissivity': 0.8, 'Absorptivity': 0.8, 'Direction': 'EastWest',
-        'Atmosphere': 'Clear', 'Elevation': 1000, 'Latitude': 27
-    }
-    
-    try:
-        cp = ConductorParams(**params)
-        conductor = ieee738.Conductor(cp)
-        return conductor.steady_state_thermal_rating()
-    except:
+# IEEE 738 ambient conditions other than temperature and wind
+AMBIENT = {
+    'WindAngleDeg': 90, 'SunTime': 12, 'Date': '12 Jun',
+    'Emissivity': 0.8, 'Absorptivity': 0.8, 'Direction': 'EastWest',
+    'Atmosphere': 'Clear', 'Elevation': 1000, 'Latitude': 27
+}
+QS_PER_INCH, KANGLE = ambient_terms(**AMBIENT)
+
+# Readable branch name of each line
+LINES_DF = pd.read_csv('hawaii40_osu/csv/lines.csv')
+NAME_TO_BRANCH = dict(zip(LINES_DF['name'], LINES_DF['branch_name']))
+
+# Conductor library entries by conductor name
+CONDUCTOR_ROWS = pd.read_csv('ieee738/conductor_library.csv').set_index('ConductorName').to_dict('index')
+
+@lru_cache(maxsize=4096)
+def calculate_rating(conductor_name, mot, temp, wind):
+    """Calculate IEEE 738 rating, cached per (conductor, MOT, temperature, wind)"""
+    if conductor_name not in CONDUCTOR_ROWS:
         return None
+    conductor_row = CONDUCTOR_ROWS[conductor_name]
+    diameter = conductor_row['CDRAD_in'] * 2
+    rating = heat_balance_rating(float(temp), float(wind), float(mot), diameter,
+                                 25.0, conductor_row['RES_25C'] / 5280, 50.0, conductor_row['RES_50C'] / 5280,
+                                 QS_PER_INCH * diameter, float(AMBIENT['Emissivity']),
+                                 float(AMBIENT['Elevation']), KANGLE)
+    return None if np.isnan(rating) else rating
 
 def run_n1_analysis():
     """N-1 Contingency Analysis"""
@@ -63,7 +69,7 @@ def run_n1_analysis():
             for line_name, flow in flows.items():
                 if line_name in line_info['name'].values:
                     line_data = line_info[line_info['name'] == line_name].iloc[0]
-                    rating_amps = calculate_rating(line_data['conductor'], line_data['MOT'], 35, 2.0, conductor_df)
+                    rating_amps = calculate_rating(line_data['conductor'], line_data['MOT'], 35, 2.0)
                     
                     if rating_amps:
                         rating_mva = np.sqrt(3) * rating_amps * line_data['v_nom'] * 1000 / 1e6
@@ -75,7 +81,7 @@ def run_n1_analysis():
             if line_violations:
                 violations.append((line_out, line_violations))
                 
-        except:
+        except Exception:
             continue
     
     return violations
@@ -84,14 +90,13 @@ def format_n1_output(violations):
     """Format N-1 results like the example"""
     for contingency, line_violations in violations:
         # Get readable name
-        lines_df = pd.read_csv('hawaii40_osu/csv/lines.csv')
-        cont_name = lines_df[lines_df['name'] == contingency]['branch_name'].iloc[0]
+        cont_name = NAME_TO_BRANCH[contingency]
         
         print(f'For loss of "{cont_name}"')
         print("Ratings Issues:")
         
         for line_name, loading in line_violations:
-            line_readable = lines_df[lines_df['name'] == line_name]['branch_name'].iloc[0]
+            line_readable = NAME_TO_BRANCH[line_name]
             print(f'"{line_readable}" {loading:.0f}%')
         print()
 
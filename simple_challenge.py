@@ -1,17 +1,25 @@
 #!/usr/bin/env python3
 
+from functools import lru_cache
+
 import pandas as pd
 import numpy as np
-import sys
 import warnings
 warnings.filterwarnings('ignore')
 
-sys.path.append('ieee738')
-from ieee738.ieee738 import ConductorParams
-import ieee738.ieee738 as ieee738
+from ieee738 import ambient_terms, heat_balance_rating, heat_balance_ratings
+
+# IEEE 738 ambient conditions other than temperature and wind
+AMBIENT = {
+    'WindAngleDeg': 90, 'SunTime': 12, 'Date': '12 Jun',
+    'Emissivity': 0.8, 'Absorptivity': 0.8, 'Direction': 'EastWest',
+    'Atmosphere': 'Clear', 'Elevation': 1000, 'Latitude': 27
+}
+QS_PER_INCH, KANGLE = ambient_terms(**AMBIENT)
 
+@lru_cache(maxsize=1)
 def load_data():
-    """Load grid data"""
+    """Load grid data (read and merged once per process; treat as read-only)"""
     lines_df = pd.read_csv('hawaii40_osu/csv/lines.csv')
     flows_df = pd.read_csv('hawaii40_osu/line_flows_nominal.csv')
     conductor_df = pd.read_csv('ieee738/conductor_library.csv')
@@ -26,55 +34,65 @@ def load_data():
 def calculate_rating(conductor_name, mot, temp, wind, conductor_df):
     """Calculate IEEE 738 rating"""
     conductor_row = conductor_df[conductor_df['ConductorName'] == conductor_name].iloc[0]
-    
-    params = {
-        'Ta': temp, 'WindVelocity': wind, 'TLo': 25, 'THi': 50,
-        'RLo': conductor_row['RES_25C'] / 5280, 'RHi': conductor_row['RES_50C'] / 5280,
-        'Diameter': conductor_row['CDRAD_in'] * 2, 'Tc': mot,
-        'WindAngleDeg': 90, 'SunTime': 12, 'Date': '12 Jun',
-        'Emissivity': 0.8, 'Absorptivity': 0.8, 'Direction': 'EastWest',
-        'Atmosphere': 'Clear', 'Elevation': 1000, 'Latitude': 27
-    }
-    
-    try:
-        cp = ConductorParams(**params)
-        conductor = ieee738.Conductor(cp)
-        return conductor.steady_state_thermal_rating()
-    except:
-        return None
+    diameter = conductor_row['CDRAD_in'] * 2
+    rating = heat_balance_rating(float(temp), float(wind), float(mot), diameter,
+                                 25.0, conductor_row['RES_25C'] / 5280, 50.0, conductor_row['RES_50C'] / 5280,
+                                 QS_PER_INCH * diameter, float(AMBIENT['Emissivity']),
+                                 float(AMBIENT['Elevation']), KANGLE)
+    return None if np.isnan(rating) else rating
+
+def line_loadings(grid_data, temp, wind=2.0):
+    """Loading (%) of every line at one ambient temperature, NaN where there is no rating"""
+    diameter = (grid_data['CDRAD_in'] * 2).to_numpy(np.float64)
+    rating_amps = heat_balance_ratings(float(temp), float(wind), grid_data['MOT'].to_numpy(np.float64), diameter,
+                                       25.0, (grid_data['RES_25C'] / 5280).to_numpy(np.float64),
+                                       50.0, (grid_data['RES_50C'] / 5280).to_numpy(np.float64),
+                                       QS_PER_INCH, float(AMBIENT['Emissivity']),
+                                       float(AMBIENT['Elevation']), KANGLE)
+    rating_amps[~(rating_amps > 0)] = np.nan
+    rating_mva = np.sqrt(3) * rating_amps * grid_data['v_nom'].to_numpy(np.float64) * 1000 / 1e6
+    return (grid_data['p0_nominal'].to_numpy(np.float64) / rating_mva) * 100
 
 def find_critical_temperature(grid_data, conductor_df):
     """STEP 1: Find when lines first overload"""
-    for temp in range(25, 70):
-        for _, line in grid_data.iterrows():
-            rating_amps = calculate_rating(line['conductor'], line['MOT'], temp, 2.0, conductor_df)
-            if rating_amps:
-                rating_mva = np.sqrt(3) * rating_amps * line['v_nom'] * 1000 / 1e6
-                loading = (line['p0_nominal'] / rating_mva) * 100
-                if loading > 100:
-                    return temp, line['branch_name'], loading
-    return None, None, None
+    # Ratings fall as ambient temperature rises, so "any line above 100%"
+    # flips once over the range; bisect for that temperature
+    temps = range(25, 70)
+    lo, hi = 0, len(temps)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if (line_loadings(grid_data, temps[mid]) > 100).any():
+            hi = mid
+        else:
+            lo = mid + 1
+    if lo == len(temps):
+        return None, None, None
+    
+    # First line (in grid order) over its rating at that temperature
+    loadings = line_loadings(grid_data, temps[lo])
+    i = int(np.argmax(loadings > 100))
+    return temps[lo], grid_data['branch_name'].iloc[i], loadings[i]
 
 def identify_critical_lines(grid_data, conductor_df, temp=50):
     """STEP 2: Find most vulnerable lines"""
     results = []
-    for _, line in grid_data.iterrows():
-        rating_amps = calculate_rating(line['conductor'], line['MOT'], temp, 2.0, conductor_df)
+    for line in grid_data.itertuples(index=False):
+        rating_amps = calculate_rating(line.conductor, line.MOT, temp, 2.0, conductor_df)
         if rating_amps:
-            rating_mva = np.sqrt(3) * rating_amps * line['v_nom'] * 1000 / 1e6
-            loading = (line['p0_nominal'] / rating_mva) * 100
-            results.append((line['branch_name'], line['conductor'], loading))
+            rating_mva = np.sqrt(3) * rating_amps * line.v_nom * 1000 / 1e6
+            loading = (line.p0_nominal / rating_mva) * 100
+            results.append((line.branch_name, line.conductor, loading))
     
     return sorted(results, key=lambda x: x[2], reverse=True)
 
 def assess_system_stress(grid_data, conductor_df, temp):
     """STEP 3: Categorize system stress"""
     loadings = []
-    for _, line in grid_data.iterrows():
-        rating_amps = calculate_rating(line['conductor'], line['MOT'], temp, 2.0, conductor_df)
+    for line in grid_data.itertuples(index=False):
+        rating_amps = calculate_rating(line.conductor, line.MOT, temp, 2.0, conductor_df)
         if rating_amps:
-            rating_mva = np.sqrt(3) * rating_amps * line['v_nom'] * 1000 / 1e6
-            loading = (line['p0_nominal'] / rating_mva) * 100
+            rating_mva = np.sqrt(3) * rating_amps * line.v_nom * 1000 / 1e6
+            loading = (line.p0_nominal / rating_mva) * 100
             loadings.append(loading)
     
     loadings = np.array(loadings)
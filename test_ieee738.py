@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the compiled IEEE 738 kernels match the reference solver.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from ieee738 import (ambient_terms, heat_balance_rating, heat_balance_ratings,
+                     steady_state_thermal_rating)
+
+AMBIENT = {
+    'WindAngleDeg': 90,
+    'SunTime': 12,
+    'Date': '12 Jun',
+    'Emissivity': 0.8,
+    'Absorptivity': 0.8,
+    'Direction': 'EastWest',
+    'Atmosphere': 'Clear',
+    'Elevation': 1000,
+    'Latitude': 27,
+}
+
+def reference_rating(**params):
+    """steady_state_thermal_rating(), NaN where it rejects the inputs"""
+    try:
+        return steady_state_thermal_rating(**params)
+    except ValueError:
+        return math.nan
+
+def check_close(kernel, reference, label):
+    if math.isnan(reference):
+        assert math.isnan(kernel), f"{label}: expected NaN, got {kernel}"
+    else:
+        assert abs(kernel - reference) <= 1e-9 * max(abs(reference), 1.0), \
+            f"{label}: kernel {kernel} != reference {reference}"
+
+def test_kernel_parity():
+    """Test heat_balance_rating(s) against Conductor.steady_state_thermal_rating()"""
+    print("Testing IEEE 738 kernel parity...")
+
+    lib = pd.read_csv('ieee738/conductor_library.csv')
+    rlo = (lib['RES_25C'] / 5280).to_numpy(np.float64)
+    rhi = (lib['RES_50C'] / 5280).to_numpy(np.float64)
+    diam = (lib['CDRAD_in'] * 2).to_numpy(np.float64)
+
+    checked = 0
+    for emissivity in (0.8, 0.0, -0.1):
+        ambient = {**AMBIENT, 'Emissivity': emissivity}
+        qs_per_inch, kangle = ambient_terms(**ambient)
+        for ta in (-10.0, 0.0, 25.0, 40.0, 75.0):
+            for wind in (0.0, 0.5, 2.0, 10.0):
+                for tc in (50.0, 75.0, 100.0, 150.0):
+                    batch = heat_balance_ratings(ta, wind, np.full(len(lib), tc), diam, 25.0, rlo,
+                                                 50.0, rhi, qs_per_inch, emissivity,
+                                                 float(ambient['Elevation']), kangle)
+                    for i in range(len(lib)):
+                        label = f"{lib['ConductorName'][i]} Ta={ta} wind={wind} Tc={tc} e={emissivity}"
+                        reference = reference_rating(**ambient, Ta=ta, WindVelocity=wind, Tc=tc,
+                                                     Diameter=diam[i], TLo=25.0, RLo=rlo[i],
+                                                     THi=50.0, RHi=rhi[i])
+                        single = heat_balance_rating(ta, wind, tc, diam[i], 25.0, rlo[i], 50.0,
+                                                     rhi[i], qs_per_inch * diam[i], emissivity,
+                                                     float(ambient['Elevation']), kangle)
+                        check_close(single, reference, label)
+                        check_close(batch[i], reference, label + " (batch)")
+                        checked += 1
+
+    print(f"   Checked {checked} ratings against the reference solver")
+
+if __name__ == '__main__':
+    test_kernel_parity()
@@ -3,9 +3,23 @@
 Utility functions and global data management for the AEP Grid Challenge application.
 """
 
+import json
 import numpy as np
+import pandas as pd
+from flask import Response, jsonify
+from flask.json.provider import DefaultJSONProvider
 from config import INITIAL_GRID_NODES, INITIAL_WEATHER_CONDITIONS
 
+try:
+    import orjson
+except ImportError:
+    # orjson is optional: without it responses use Flask's JSON encoder
+    orjson = None
+
+# Loading percentages at which a line becomes 'caution' and 'critical'
+STATUS_THRESHOLDS = np.array([60, 90])
+STATUS_LABELS = np.array(['normal', 'caution', 'critical'])
+
 # Initialize global variables for AI analysis
 grid_nodes = []
 weather_conditions = INITIAL_WEATHER_CONDITIONS.copy()
@@ -18,36 +32,34 @@ def update_global_data(analyzer):
     # Convert grid data to nodes format for AI analysis
     grid_nodes.clear()
     if hasattr(analyzer, 'grid_data') and analyzer.grid_data is not None:
-        # Group lines by major areas/substations for node representation
-        node_groups = {}
-        for _, line in analyzer.grid_data.iterrows():
-            # Extract area/substation from branch name
-            branch_name = str(line.get('branch_name', line.get('name', 'Unknown')))
-            area_name = branch_name.split('-')[0].strip() if '-' in branch_name else branch_name[:15]
-            
-            if area_name not in node_groups:
-                node_groups[area_name] = {
-                    'total_load': 0,
-                    'total_capacity': 0,
-                    'line_count': 0,
-                    'voltage_levels': []
-                }
-            
-            # Aggregate data for this area
-            node_groups[area_name]['total_load'] += float(line.get('p0_nominal', 0))
-            node_groups[area_name]['total_capacity'] += float(line.get('MOT', 100))
-            node_groups[area_name]['line_count'] += 1
-            node_groups[area_name]['voltage_levels'].append(float(line.get('v_nom', 138)))
+        gd = analyzer.grid_data
+        
+        def column(name, default):
+            return gd[name] if name in gd else pd.Series(default, index=gd.index)
+        
+        # Group lines by major areas/substations for node representation,
+        # taking the area/substation from the branch name
+        branch_names = column('branch_name', column('name', 'Unknown')).astype(str)
+        areas = branch_names.str.split('-').str[0].str.strip().where(
+            branch_names.str.contains('-', regex=False), branch_names.str[:15])
+        node_groups = pd.DataFrame({
+            'area': areas,
+            'load': column('p0_nominal', 0).astype(float),
+            'capacity': column('MOT', 100).astype(float),
+            'voltage': column('v_nom', 138).astype(float)
+        }).groupby('area', sort=False).agg(total_load=('load', 'sum'),
+                                           total_capacity=('capacity', 'sum'),
+                                           voltage=('voltage', 'mean'),
+                                           line_count=('load', 'size'))
         
         # Create nodes from grouped data
-        for area_name, data in node_groups.items():
-            avg_voltage = np.mean(data['voltage_levels']) if data['voltage_levels'] else 138
+        for area_name, total_load, total_capacity, avg_voltage, line_count in node_groups.itertuples(name=None):
             grid_nodes.append({
                 'name': area_name,
-                'load': round(data['total_load'], 1),
-                'capacity': round(data['total_capacity'], 1),
+                'load': round(total_load, 1),
+                'capacity': round(total_capacity, 1),
                 'voltage': round(avg_voltage, 1),
-                'line_count': data['line_count']
+                'line_count': line_count
             })
     
     # If no grid data, create realistic Hawaii grid sample data
@@ -62,6 +74,60 @@ def update_global_data(analyzer):
         ])
 
 
+def conductor_display_names(conductors):
+    """Short conductor labels, e.g. '3/0 PIGEON' for '3/0 ACSR 6/1 PIGEON'"""
+    parts = conductors.str.split()
+    # Keep the main size and the bird code name of ACSR conductors
+    is_acsr = conductors.str.contains('ACSR', regex=False) & (parts.str.len() >= 2)
+    return (parts.str[0] + ' ' + parts.str[-1]).where(is_acsr, conductors)
+
+
+def loading_status(loading):
+    """Status label ('normal', 'caution' or 'critical') for each loading percentage"""
+    return STATUS_LABELS[np.searchsorted(STATUS_THRESHOLDS, loading, side='right')]
+
+
+if orjson is not None:
+    class OrjsonProvider(DefaultJSONProvider):
+        """Flask JSON provider that encodes with orjson, NumPy values included"""
+        
+        def dumps(self, obj, **kwargs):
+            option = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+            if kwargs.get('sort_keys', self.sort_keys):
+                option |= orjson.OPT_SORT_KEYS
+            if kwargs.get('indent'):
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=self.default, option=option).decode()
+            except orjson.JSONEncodeError:
+                # orjson rejects some keys the stdlib encoder takes (e.g. NumPy floats)
+                return super().dumps(obj, **kwargs)
+        
+        def loads(self, s, **kwargs):
+            return orjson.loads(s)
+else:
+    OrjsonProvider = DefaultJSONProvider
+
+
+def json_response(obj, status=200):
+    """JSON response for obj, encoded with orjson when it is installed"""
+    if orjson is None:
+        return jsonify(obj), status
+    try:
+        body = orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    except orjson.JSONEncodeError:
+        # orjson rejects some keys the stdlib encoder takes (e.g. NumPy floats)
+        return jsonify(obj), status
+    return Response(body, status=status, mimetype='application/json')
+
+
+def json_loads(raw):
+    """Parse a JSON document (bytes or str), with orjson when it is installed"""
+    if orjson is None:
+        return json.loads(raw)
+    return orjson.loads(raw)
+
+
 def get_global_weather_conditions():
     """Get current global weather conditions"""
     return weather_conditions
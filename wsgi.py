@@ -0,0 +1,8 @@
+#!/usr/bin/env python3
+"""
+WSGI entry point for serving the AEP Grid Challenge application in production:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+"""
+
+from main import app